@@ -1,12 +1,17 @@
 import streamlit as st
-import pandas as pd
-import os
-import tempfile
-from extractor import extract_text_from_pdf, filter_relevant_pages, analyze_page_with_llm, merge_financials
-from utils import calculate_ratios_structured, format_currency
+import hashlib
+import asyncio
+from schemas import ExtractedFinancials
+from cache import cache_key, cache_get, cache_put
+
+# extractor (OpenAI client, pdfium) and utils (pdfplumber, pandas) are imported lazily
+# inside the upload path, so the first page render does not pay for them.
 
 st.set_page_config(page_title="IDX Financial Analyzer", layout="wide")
 
+# Pages sent together in one LLM request
+LLM_BATCH_SIZE = 4
+
 # Custom CSS for Premium Look
 st.markdown("""
     <style>
@@ -162,58 +167,153 @@ st.markdown("""
 Aplikasi ini menggunakan **LLM (Grok 4.1 Fast Reasoning)** untuk ekstraksi data laporan keuangan yang lebih cerdas dan fleksibel.
 """)
 
+def analyze_document(pdf_source):
+    """
+    Runs the extraction pipeline (text -> relevant pages -> regex / LLM -> incremental merge) on a PDF
+    (path, bytes or binary file-like object).
+    Returns a tuple of (merged ExtractedFinancials or None, usage_stats).
+    """
+    from extractor import (
+        extract_text_from_pdf, filter_relevant_pages, analyze_pages_with_llm,
+        merge_pair, is_page_financially_dense, dedupe_pages, try_regex_extract,
+    )
+    
+    # 1. Extract Text
+    pages_text = extract_text_from_pdf(pdf_source)
+    
+    # 2. Filter Relevant Pages
+    relevant_map = filter_relevant_pages(pages_text)
+    
+    # Collect indices to process, in page order (stable batches and cache keys across reruns)
+    indices = sorted(set(relevant_map['balance_sheet'] + relevant_map['income_statement']))
+    if not indices:
+        indices = list(range(min(5, len(pages_text))))
+    
+    # Skip pages without enough numbers to hold a statement table
+    indices = [idx for idx in indices if is_page_financially_dense(pages_text[idx])]
+    
+    # Pages with identical text are sent once; merging the same result twice adds nothing
+    indices = list(dedupe_pages(pages_text, indices))
+    
+    # Results are folded into the merge as soon as they are available, in page order:
+    # results_by_page holds finished pages (None = nothing extracted) until every page
+    # before them is finished too, then they are merged and released.
+    results_by_page = {}
+    merge_state = {"merged": None, "complete": False, "next": 0}
+    
+    def fold_finished_pages():
+        while merge_state["next"] < len(indices) and indices[merge_state["next"]] in results_by_page:
+            result = results_by_page.pop(indices[merge_state["next"]])
+            merge_state["next"] += 1
+            if result is None or merge_state["complete"]:
+                continue
+            if merge_state["merged"] is None:
+                merge_state["merged"] = result
+            else:
+                merge_state["complete"] = merge_pair(merge_state["merged"], result)
+    
+    # 3. Clean statement pages are read with regexes; only the rest goes to the LLM
+    llm_indices = []
+    for idx in indices:
+        result = try_regex_extract(pages_text[idx])
+        if result is not None:
+            results_by_page[idx] = result
+        else:
+            llm_indices.append(idx)
+    fold_finished_pages()
+    
+    # 4. Analyze with LLM
+    usage_stats = {
+        "prompt_tokens": 0,
+        "completion_tokens": 0,
+        "cached_tokens": 0
+    }
+    progress_bar = st.progress(0)
+    total = len(llm_indices)
+    
+    # Pages are grouped into batches (one LLM request each) and the batches
+    # run concurrently on one event loop; results are keyed by page index so
+    # the merge order stays the same as the page order whatever the completion order.
+    # Batches follow page order, so reruns build the same requests and hit the page cache.
+    # Every batch is awaited even once the merge is complete: requests in flight are
+    # already billed, and finishing them counts their usage and stores their results.
+    batches = [llm_indices[b:b + LLM_BATCH_SIZE] for b in range(0, total, LLM_BATCH_SIZE)]
+    
+    # (in-flight requests are capped by LLM_CONCURRENCY inside extractor)
+    async def analyze_batch(batch):
+        results, usage = await analyze_pages_with_llm([pages_text[idx] for idx in batch])
+        return batch, results, usage
+    
+    async def analyze_batches():
+        done = 0
+        tasks = [asyncio.ensure_future(analyze_batch(batch)) for batch in batches]
+        for next_batch in asyncio.as_completed(tasks):
+            batch, results, usage = await next_batch
+            done += len(batch)
+            # Update the one progress element in place rather than appending a new st.write per batch
+            progress_bar.progress(done / total, text=f"📝 Halaman {', '.join(str(idx + 1) for idx in batch)} selesai diproses...")
+            results_by_page.update(zip(batch, results, strict=True))
+            fold_finished_pages()
+            usage_stats["prompt_tokens"] += usage.get("prompt_tokens", 0)
+            usage_stats["completion_tokens"] += usage.get("completion_tokens", 0)
+            usage_stats["cached_tokens"] += usage.get("cached_tokens", 0)
+    
+    # The regex pass alone may already have filled everything
+    if batches and not merge_state["complete"]:
+        asyncio.run(analyze_batches())
+
+    # 5. Merge (already folded page by page above)
+    return merge_state["merged"], usage_stats
+
+@st.cache_data(show_spinner=False)
+def load_financials(pdf_hash, _uploaded_file):
+    """
+    Returns (final_data, usage_stats, from_disk_cache) for an uploaded PDF.
+    Memoized by Streamlit on pdf_hash (the underscore argument is not hashed), so reruns
+    triggered by widget interaction never re-parse the PDF or call the LLM again.
+    """
+    from extractor import LLM_MODEL, SYSTEM_PROMPT, PIPELINE_VERSION
+    
+    # Prompt and pipeline version are part of the key, so changes to the extraction
+    # logic never serve whole-document results from an older pipeline
+    doc_key = cache_key("document", PIPELINE_VERSION, LLM_MODEL, SYSTEM_PROMPT, pdf_hash)
+    cached_doc = cache_get(doc_key)
+    if cached_doc is not None:
+        # Same PDF was analyzed in an earlier session: skip extraction entirely
+        final_data = ExtractedFinancials.model_validate(cached_doc["result"])
+        return final_data, {"prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0}, True
+
+    # The upload is already an in-memory buffer: hand it to pdfium directly
+    # instead of a temp-file round trip
+    _uploaded_file.seek(0)
+    with st.spinner("🚀 AI sedang menganalisis dokumen..."):
+        final_data, usage_stats = analyze_document(_uploaded_file)
+
+    if final_data:
+        cache_put(doc_key, {"result": final_data.model_dump(mode="json"), "usage": usage_stats})
+    return final_data, usage_stats, False
+
 uploaded_file = st.file_uploader("Upload Laporan Keuangan (PDF)", type="pdf")
 
 if uploaded_file is not None:
     try:
-        # Save uploaded file to a temporary location
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp_file:
-            tmp_file.write(uploaded_file.read())
-            tmp_path = tmp_file.name
-
-        with st.spinner("🚀 AI sedang menganalisis dokumen..."):
-            # 1. Extract Text
-            pages_text = extract_text_from_pdf(tmp_path)
-            
-            # 2. Filter Relevant Pages
-            relevant_map = filter_relevant_pages(pages_text)
-            
-            # Collect indices to process
-            indices = set(relevant_map['balance_sheet'] + relevant_map['income_statement'])
-            if not indices:
-                indices = set(range(min(5, len(pages_text))))
-            
-            # 3. Analyze with LLM
-            extracted_results = []
-            usage_stats = {
-                "prompt_tokens": 0,
-                "completion_tokens": 0,
-                "cached_tokens": 0
-            }
-            progress_bar = st.progress(0)
-            total = len(indices)
-            
-            for i, idx in enumerate(indices):
-                progress_bar.progress((i + 1) / total)
-                st.write(f"📝 Memproses Halaman {idx + 1}...")
-                result, usage = analyze_page_with_llm(pages_text[idx])
-                if result:
-                    extracted_results.append(result)
-                    usage_stats["prompt_tokens"] += usage.get("prompt_tokens", 0)
-                    usage_stats["completion_tokens"] += usage.get("completion_tokens", 0)
-                    usage_stats["cached_tokens"] += usage.get("cached_tokens", 0)
-            
-            # 4. Merge
-            final_data = merge_financials(extracted_results)
-            
-        os.remove(tmp_path) # Cleanup
+        # Hash the upload through a zero-copy view instead of materializing a bytes copy
+        with uploaded_file.getbuffer() as pdf_buffer:
+            pdf_hash = hashlib.sha256(pdf_buffer).hexdigest()
+
+        final_data, usage_stats, from_disk_cache = load_financials(pdf_hash, uploaded_file)
+        if from_disk_cache:
+            st.info("♻️ Dokumen ini sudah pernah dianalisis, hasil diambil dari cache.")
 
         if final_data:
+            from utils import calculate_ratios_structured, format_currency
+            
             st.success(f"Analisis Selesai: **{final_data.company_name}** ({final_data.report_period})")
             
             # Display Extraction Metadata
             with st.expander("🔍 Detail Ekstraksi AI"):
-                st.json(final_data.model_dump())
+                # model_dump_json serializes in pydantic-core directly, without a Python dict round trip
+                st.json(final_data.model_dump_json())
 
             # 5. Calculate Ratios
             ratios = calculate_ratios_structured(final_data)
@@ -0,0 +1,29 @@
+# Times the per-page keyword scans on the sample filings (first PAGES_PER_PDF pages of each)
+import time
+from extractor import extract_text_from_pdf, filter_relevant_pages, detect_scale
+
+SAMPLE_PDFS = [
+    "ASII Astra Account March 2025.pdf",
+    "BUMI - Laporan Keuangan Q1 31 Mar 2025.pdf",
+    "DEWA LK PTDH Konsol per 31 Maret 2025.pdf",
+]
+PAGES_PER_PDF = 60
+REPEAT = 30
+
+def best_of(fn, repeat=REPEAT):
+    """Best wall time of repeat runs, in milliseconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+def run_benchmarks():
+    pages = [text for pdf in SAMPLE_PDFS for text in extract_text_from_pdf(pdf, max_pages=PAGES_PER_PDF)]
+    print(f"{len(pages)} pages")
+    print(f"filter_relevant_pages: {best_of(lambda: filter_relevant_pages(pages)):.2f} ms")
+    print(f"detect_scale (every page): {best_of(lambda: [detect_scale(text) for text in pages]):.2f} ms")
+
+if __name__ == "__main__":
+    run_benchmarks()
@@ -0,0 +1,46 @@
+import os
+import json
+import hashlib
+import threading
+from typing import Optional
+
+# Directory for content-addressed LLM results (one JSON file per key)
+CACHE_DIR = os.getenv("LLM_CACHE_DIR", ".llm_cache")
+
+def cache_key(*parts: str) -> str:
+    """
+    Builds a content-addressed key from the given parts (model, prompt, text, ...).
+    """
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(part.encode("utf-8"))
+        h.update(b"\x00")
+    return h.hexdigest()
+
+def _cache_path(key: str) -> str:
+    return os.path.join(CACHE_DIR, f"{key}.json")
+
+def cache_get(key: str) -> Optional[dict]:
+    """
+    Returns the cached payload for key, or None on a miss / unreadable entry.
+    """
+    try:
+        with open(_cache_path(key), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def cache_put(key: str, payload: dict) -> None:
+    """
+    Stores payload under key. Writes to a temp file first so concurrent readers
+    never see a half-written entry.
+    """
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        path = _cache_path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(payload, f)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Error writing cache entry: {e}")
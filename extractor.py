@@ -1,146 +1,473 @@
 import os
-import pypdf
-from typing import List, Dict, Any
-from schemas import ExtractedFinancials, BalanceSheet, IncomeStatement
-from openai import OpenAI
-from tenacity import retry, stop_after_attempt, wait_fixed
+import re
+import pypdfium2 as pdfium
+from typing import List, Dict, Any, Optional, Union, BinaryIO
+from schemas import ExtractedFinancials, ExtractedFinancialsBatch, BalanceSheet, IncomeStatement
+from openai import AsyncOpenAI, RateLimitError, APIConnectionError, APITimeoutError, InternalServerError
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_random_exponential
 import json
+import hashlib
+import functools
+import asyncio
+import weakref
+from collections import OrderedDict
 from dotenv import load_dotenv
+from cache import cache_key, cache_get, cache_put
 
 load_dotenv()
 
-# client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-client = OpenAI(
-    api_key=os.environ.get("XAI_API_KEY"),
-    base_url="https://api.x.ai/v1", # The xAI API base URL
+# AsyncOpenAI keeps its connection pool on the event loop that opened it, and every
+# asyncio.run (one per CLI run / Streamlit upload) starts a new loop: one client per loop.
+_clients = weakref.WeakKeyDictionary()
+
+def get_client() -> AsyncOpenAI:
+    loop = asyncio.get_running_loop()
+    if loop not in _clients:
+        # _clients[loop] = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        _clients[loop] = AsyncOpenAI(
+            api_key=os.environ.get("XAI_API_KEY"),
+            base_url="https://api.x.ai/v1", # The xAI API base URL
+        )
+    return _clients[loop]
+
+# Max LLM requests in flight at once, shared by every caller on the loop
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "8"))
+_semaphores = weakref.WeakKeyDictionary()
+
+def _llm_semaphore() -> asyncio.Semaphore:
+    # Same per-loop rule as the client: a semaphore is bound to the loop it was first used on
+    loop = asyncio.get_running_loop()
+    if loop not in _semaphores:
+        _semaphores[loop] = asyncio.Semaphore(LLM_CONCURRENCY)
+    return _semaphores[loop]
+
+# Only transient errors (429, network, timeout, 5xx) are retried; a bad request or a schema
+# failure would fail the same way again. Randomized exponential backoff (capped at 20s)
+# keeps concurrent calls from retrying in lockstep; the semaphore slot is released while waiting.
+llm_retry = retry(
+    stop=stop_after_attempt(5),
+    wait=wait_random_exponential(multiplier=0.5, max=20),
+    retry=retry_if_exception_type((RateLimitError, APIConnectionError, APITimeoutError, InternalServerError)),
+    reraise=True,
 )
 
-def extract_text_from_pdf(pdf_path: str, max_pages: int = 20) -> List[str]:
+def _page_text(pdf, index: int) -> str:
+    page = pdf[index]
+    textpage = page.get_textpage()
+    text = textpage.get_text_range()
+    textpage.close()
+    page.close()
+    # pdfium uses CRLF line breaks; normalize to match the rest of the pipeline
+    return text.replace("\r\n", "\n") if text else ""
+
+def extract_text_from_pdf(pdf_source: Union[str, bytes, BinaryIO], max_pages: int = 20) -> List[str]:
     """
     Extracts text from each page of the PDF, up to max_pages.
+    pdf_source is a file path, the PDF bytes, or a binary file-like object (e.g. an upload
+    buffer), so in-memory documents never need a temp file.
     Returns a list of strings, where each string is the text content of a page.
+    Pages are read serially: pdfium is not thread-safe, and at max_pages=20 (~100 ms of
+    work) starting worker processes costs more than it saves.
     """
-    if not os.path.exists(pdf_path):
-        raise FileNotFoundError(f"PDF file not found at: {pdf_path}")
+    if isinstance(pdf_source, str) and not os.path.exists(pdf_source):
+        raise FileNotFoundError(f"PDF file not found at: {pdf_source}")
         
-    pages_text = []
     try:
-        reader = pypdf.PdfReader(pdf_path)
-        # Limit to the first max_pages
-        pages_to_read = reader.pages[:max_pages]
-        for page in pages_to_read:
-            text = page.extract_text()
-            pages_text.append(text if text else "")
+        pdf = pdfium.PdfDocument(pdf_source)
+        try:
+            # Limit to the first max_pages
+            return [_page_text(pdf, i) for i in range(min(len(pdf), max_pages))]
+        finally:
+            pdf.close()
     except Exception as e:
         print(f"Error reading PDF: {e}")
         return []
-        
-    return pages_text
+
+def _keyword_re(keywords: List[str]) -> re.Pattern:
+    """Compiles a keyword list into one case-insensitive alternation."""
+    return re.compile("|".join(re.escape(kw) for kw in keywords), re.IGNORECASE)
+
+# (scale_string, multiplier) per scale, in priority order, with the header phrases that mark it
+SCALES = [
+    (("Miliaran (Billions)", 1_000_000_000.0), ["miliaran rupiah", "milyaran rupiah", "in billions", "dalam miliaran"]),
+    (("Jutaan (Millions)", 1_000_000.0), ["jutaan rupiah", "in millions", "dalam jutaan"]),
+    (("Ribuan (Thousands)", 1_000.0), ["ribuan rupiah", "in thousands", "dalam ribuan"]),
+]
+SCALE_CHARS = 2000 # Usually in the header
+FULL_UNITS = ("Satuan Penuh (Full Units)", 1.0)
+
+def _header_scales(text: str) -> List[tuple[str, float]]:
+    """Every scale named in the page header, in priority order."""
+    head = text[:SCALE_CHARS].lower()
+    return [scale for scale, keywords in SCALES if any(head.find(kw) != -1 for kw in keywords)]
 
 def detect_scale(text: str) -> tuple[str, float]:
     """
-    Detects the scale (multiplier) from the text using regex.
+    Detects the scale (multiplier) from the page header with plain substring lookups.
     Returns a tuple of (scale_string, multiplier).
     """
-    text_lower = text.lower()[:2000] # Usually in the header
-    
-    # Billions / Miliaran
-    if any(kw in text_lower for kw in ["miliaran rupiah", "milyaran rupiah", "in billions", "dalam miliaran"]):
-        return "Miliaran (Billions)", 1_000_000_000.0
+    scales = _header_scales(text)
+    return scales[0] if scales else FULL_UNITS
+
+# Number-shaped tokens: thousand-separated amounts (83,361 / 1.234.567) or 3+ digit runs
+_NUMERIC_TOKEN_RE = re.compile(r"\d{1,3}(?:[.,]\d{3})+|\d{3,}")
+MIN_NUMERIC_TOKENS = 15
+MIN_PAGE_CHARS = 200
+# Statement tables are mostly digits (7%+ on the sample filings); narrative pages sit far below
+MIN_DIGIT_RATIO = 0.03
+# Upper bound on page text sent to the LLM (after _compact_for_llm)
+MAX_PAGE_CHARS = 6000
+
+def is_page_financially_dense(text: str) -> bool:
+    """
+    Cheap pre-filter before the LLM: True if the page has enough number-shaped tokens
+    and a high enough share of digits to contain a financial table (rejects cover pages,
+    TOC fragments, narrative notes, blank continuations).
+    """
+    if not text or len(text) < MIN_PAGE_CHARS:
+        return False
+    count = 0
+    for _ in _NUMERIC_TOKEN_RE.finditer(text):
+        count += 1
+        if count >= MIN_NUMERIC_TOKENS:
+            break
+    else:
+        return False
+    return sum(map(str.isdigit, text)) / len(text) >= MIN_DIGIT_RATIO
+
+# Thousand-separated amount: the first line with one marks the start of the table
+_AMOUNT_RE = re.compile(r"\d{1,3}(?:[.,]\d{3})+")
+_WHITESPACE_RE = re.compile(r"[ \t]+")
+_ALNUM_RE = re.compile(r"[^\W_]")
+# Shorter lines are page numbers, column rules or stray marks, never a labeled row
+MIN_LINE_CHARS = 3
+
+def _densest_window(lines: List[str], budget: int) -> List[str]:
+    """Returns the run of consecutive lines within budget chars that holds the most digits."""
+    digits = [sum(c.isdigit() for c in line) for line in lines]
+    best_digits, best_start, best_stop = -1, 0, 0
+    start = chars = window_digits = 0
+    for stop, line in enumerate(lines):
+        chars += len(line) + 1
+        window_digits += digits[stop]
+        while chars > budget and start <= stop:
+            chars -= len(lines[start]) + 1
+            window_digits -= digits[start]
+            start += 1
+        if window_digits > best_digits:
+            best_digits, best_start, best_stop = window_digits, start, stop + 1
+    return lines[best_start:best_stop]
+
+def _compact_for_llm(text: str, max_chars: int = MAX_PAGE_CHARS) -> str:
+    """
+    Shrinks a page before it is sent to the LLM. The header (everything before the first
+    amount: company, statement title, period, scale) is kept as is; in the table body,
+    lines without any digit are dropped. Everywhere, whitespace runs are collapsed and
+    lines under MIN_LINE_CHARS or without any letter/digit are dropped. If the result
+    is still over max_chars, only the densest numeric window of the body is kept.
+    """
+    lines = [_WHITESPACE_RE.sub(" ", line).strip() for line in text.splitlines()]
+    lines = [line for line in lines if len(line) >= MIN_LINE_CHARS and _ALNUM_RE.search(line)]
     
-    # Millions / Jutaan
-    if any(kw in text_lower for kw in ["jutaan rupiah", "in millions", "dalam jutaan"]):
-        return "Jutaan (Millions)", 1_000_000.0
+    table_start = next((n for n, line in enumerate(lines) if _AMOUNT_RE.search(line)), len(lines))
+    header = lines[:table_start]
+    body = [line for line in lines[table_start:] if any(c.isdigit() for c in line)]
     
-    # Thousands / Ribuan
-    if any(kw in text_lower for kw in ["ribuan rupiah", "in thousands", "dalam ribuan"]):
-        return "Ribuan (Thousands)", 1_000.0
-        
-    return "Satuan Penuh (Full Units)", 1.0
+    header_text = "\n".join(header)[:max_chars]
+    budget = max_chars - len(header_text) - 1
+    if sum(len(line) + 1 for line in body) > budget:
+        body = _densest_window(body, budget) if budget > 0 else []
+    return "\n".join([header_text] + body) if header_text else "\n".join(body)
+
+def dedupe_pages(pages_text: List[str], indices) -> Dict[int, List[int]]:
+    """
+    Groups page indices whose extracted text is identical (blank pages, repeated
+    continuation pages), so each distinct text is analyzed only once.
+    Returns {first index: [all indices sharing that text]} in page order.
+    """
+    groups = {}
+    first_by_hash = {}
+    for idx in sorted(indices):
+        digest = hashlib.blake2b(pages_text[idx].encode("utf-8"), digest_size=16).digest()
+        first = first_by_hash.setdefault(digest, idx)
+        groups.setdefault(first, []).append(idx)
+    return groups
+
+SECTION_KEYWORDS = {
+    # 1. Keywords for Start
+    'bs_start': ["laporan posisi keuangan", "statement of financial position"],
+    'is_start': ["laporan laba rugi", "statement of profit or loss", "laba rugi dan penghasilan komprehensif"],
+    # 2. Keywords for End (Termination)
+    'bs_end': ["jumlah liabilitas dan ekuitas", "total liabilities and equity"],
+    'is_end': ["laba (rugi) per saham", "earnings (loss) per share", "laba per saham"],
+    # 3. Exclude keywords (like Table of Contents)
+    'exclude': ["daftar isi", "table of contents"],
+    'stop_all': ["catatan atas laporan keuangan", "notes to the financial statements"],
+}
+
+# All section markers are looked up in the first 1000 chars (lowercased once per page)
+HEAD_CHARS = 1000
+# TOC and notes markers only count when they appear this close to the top
+TOP_CHARS = 500
+# End markers can be anywhere on the page: the rest of the page is only searched inside a
+# section, starting early enough to catch a marker that straddles HEAD_CHARS
+TAIL_START = HEAD_CHARS - max(len(kw) for tag in ('bs_end', 'is_end') for kw in SECTION_KEYWORDS[tag]) + 1
+
+def _section_ends(text: str, tags: Dict[str, int], tag: str) -> bool:
+    if tag in tags:
+        return True
+    if len(text) <= HEAD_CHARS:
+        return False
+    text_lower = text.lower()
+    return any(text_lower.find(kw, TAIL_START) != -1 for kw in SECTION_KEYWORDS[tag])
+
+def _head_tags(text: str) -> Dict[str, int]:
+    """
+    Looks up every marker in the page header; returns {tag: end offset of its earliest-ending hit}.
+    """
+    head = text[:HEAD_CHARS].lower()
+    tags = {}
+    for tag, keywords in SECTION_KEYWORDS.items():
+        for kw in keywords:
+            start = head.find(kw)
+            if start != -1 and start + len(kw) < tags.get(tag, HEAD_CHARS + 1):
+                tags[tag] = start + len(kw)
+    return tags
+
+def scan_page_headers(pages_text: List[str]) -> List[Dict[str, int]]:
+    """
+    Keyword hits for every page header, computed in one batch up front
+    (one row per page: {tag: end offset of earliest-ending hit}).
+    """
+    return [_head_tags(text) for text in pages_text]
 
 def filter_relevant_pages(pages_text: List[str]) -> Dict[str, List[int]]:
     """
     Identifies relevant pages for Balance Sheet (Posisi Keuangan) and Income Statement (Laba Rugi)
     by detecting the start and end of each section.
+    The header scan (all markers) runs for all pages first; the state machine then walks the
+    precomputed rows and only scans past the header for an end marker while inside a section.
     """
     relevant_pages = {
         'balance_sheet': [],
         'income_statement': []
     }
     
-    # 1. Keywords for Start
-    kw_bs_start = ["laporan posisi keuangan", "statement of financial position"]
-    kw_is_start = ["laporan laba rugi", "statement of profit or loss", "laba rugi dan penghasilan komprehensif"]
-    
-    # 2. Keywords for End (Termination)
-    kw_bs_end = ["jumlah liabilitas dan ekuitas", "total liabilities and equity"]
-    kw_is_end = ["laba (rugi) per saham", "earnings (loss) per share", "laba per saham"]
-
-    # 3. Exclude keywords (like Table of Contents)
-    kw_exclude = ["daftar isi", "table of contents"]
-    kw_stop_all = ["catatan atas laporan keuangan", "notes to the financial statements"]
-
+    page_tags = scan_page_headers(pages_text)
     current_section = None # 'bs' or 'is'
 
-    for i, text in enumerate(pages_text):
-        text_lower = text.lower()
-        
+    for i, (text, tags) in enumerate(zip(pages_text, page_tags)):
         # Skip Table of Contents
-        if any(ex in text_lower[:500] for ex in kw_exclude):
+        if tags.get('exclude', HEAD_CHARS + 1) <= TOP_CHARS:
             continue
             
         # Global stop for primary statements
-        if any(stop in text_lower[:500] for stop in kw_stop_all):
+        if tags.get('stop_all', HEAD_CHARS + 1) <= TOP_CHARS:
             current_section = None
             # We don't continue because we might hit another section start on the same page? 
             # Usually notes start on its own page.
             # But let's check for starts below.
 
         # Check for Start of Balance Sheet
-        if any(kw in text_lower[:1000] for kw in kw_bs_start):
+        if 'bs_start' in tags:
             current_section = 'bs'
             relevant_pages['balance_sheet'].append(i)
             # Check if it also ends on the same page
-            if any(kw in text_lower for kw in kw_bs_end):
+            if _section_ends(text, tags, 'bs_end'):
                 current_section = None
             continue
 
         # Check for Start of Income Statement
-        if any(kw in text_lower[:1000] for kw in kw_is_start):
+        if 'is_start' in tags:
             current_section = 'is'
             relevant_pages['income_statement'].append(i)
             # Check if it also ends on the same page
-            if any(kw in text_lower for kw in kw_is_end):
+            if _section_ends(text, tags, 'is_end'):
                 current_section = None
             continue
 
         # If we are already in a section, continue adding pages until end is found
         if current_section == 'bs':
             relevant_pages['balance_sheet'].append(i)
-            if any(kw in text_lower for kw in kw_bs_end):
+            if _section_ends(text, tags, 'bs_end'):
                 current_section = None
         elif current_section == 'is':
             relevant_pages['income_statement'].append(i)
-            if any(kw in text_lower for kw in kw_is_end):
+            if _section_ends(text, tags, 'is_end'):
                 current_section = None
             
     return relevant_pages
 
-@retry(stop=stop_after_attempt(3), wait=wait_fixed(2))
-def analyze_page_with_llm(text_content: str) -> tuple[ExtractedFinancials, dict]:
+# --- Deterministic extraction for well-structured statement pages ---
+
+# Labeled rows per schema field (Indonesian / English, matched at line start)
+REGEX_FIELDS = {
+    'balance_sheet': {
+        'total_assets': ["jumlah aset", "total assets"],
+        'total_liabilities': ["jumlah liabilitas", "total liabilities"],
+        'total_equity': ["jumlah ekuitas", "total equity"],
+        'current_assets': ["jumlah aset lancar", "total current assets"],
+        'current_liabilities': ["jumlah liabilitas jangka pendek", "total current liabilities"],
+        'cash_equivalents': ["kas dan setara kas", "cash and cash equivalents"],
+        'inventories': ["persediaan", "inventories"],
+    },
+    'income_statement': {
+        'revenues': ["pendapatan bersih", "pendapatan usaha", "pendapatan", "penjualan bersih", "net revenue", "revenues", "net sales"],
+        'gross_profit': ["laba bruto", "laba kotor", "gross profit"],
+        'net_income': ["laba bersih periode berjalan", "laba periode berjalan", "laba bersih tahun berjalan", "laba tahun berjalan", "profit for the period", "profit for the year"],
+        'finance_cost': ["beban keuangan", "biaya keuangan", "beban bunga dan keuangan", "beban bunga", "finance costs"],
+    },
+}
+# Cross-check row: must equal total assets and total liabilities + equity
+REGEX_TOTAL_CHECK = ["jumlah liabilitas dan ekuitas", "total liabilities and equity"]
+
+# label [- neto] [note ref like 4 / 24,29a / 10c] amount, amount = 1,234 / (1.234) / (921) / 856 / -
+_ROW_TAIL = (
+    r")(?:[ \t]*[-,][ \t]*(?:neto|bersih|net))?"
+    r"[ \t]+(?:\d{1,2}[a-z]?(?:[.,]\d{1,2}[a-z.]*)*[ \t]+)?"
+    r"(?P<amount>\(?\d{1,3}(?:[.,]\d{3})+\)?|\(\d+\)|\d{3,}|-+)(?![\d.,])"
+)
+
+def _row_re(labels: List[str]) -> re.Pattern:
+    return re.compile(
+        r"^[ \t]*(?:" + "|".join(re.escape(label) for label in labels) + _ROW_TAIL,
+        re.IGNORECASE | re.MULTILINE,
+    )
+
+RE_FIELD_ROWS = {
+    section: {field: _row_re(labels) for field, labels in fields.items()}
+    for section, fields in REGEX_FIELDS.items()
+}
+RE_TOTAL_CHECK_ROW = _row_re(REGEX_TOTAL_CHECK)
+
+RE_COMPANY = re.compile(r"\bPT\.?[ \t]+[A-Z0-9][A-Za-z0-9&.,' -]{1,60}?[ \t]+Tbk\b")
+MONTHS_ID = ["januari", "februari", "maret", "april", "mei", "juni", "juli",
+             "agustus", "september", "oktober", "november", "desember"]
+RE_PERIOD_ID = re.compile(r"\b(\d{1,2})[ \t]+(" + "|".join(MONTHS_ID) + r")[ \t]+(\d{4})\b", re.IGNORECASE)
+RE_CURRENCY_USD = _keyword_re(["dolar", "dollar", "usd", "us$"])
+RE_CURRENCY_IDR = _keyword_re(["rupiah", "idr"])
+RE_FULL_UNITS = _keyword_re(["penuh", "in full"])
+# Notes pages restate subsidiaries' and associates' figures under the same row labels.
+# Statement pages mention the notes only in their "integral part" footer.
+RE_NOTES_TITLE = re.compile(r"catatan\s+atas\s+laporan\s+keuangan|notes\s+to\s+the\s+(?:[a-z]+\s+){0,2}financial\s+statements", re.IGNORECASE)
+RE_NOTES_FOOTER = re.compile(r"merupakan\s+bagian|integral\s+part", re.IGNORECASE)
+
+# Relative tolerance for the balance-sheet identity checks (rounding in the statements)
+REGEX_TOLERANCE = 0.005
+
+def _parse_amount(raw: str) -> float:
+    if raw.startswith("-"):
+        return 0.0
+    negative = raw.startswith("(")
+    value = float(raw.strip("()").replace(",", "").replace(".", ""))
+    return -value if negative else value
+
+def _statement_header(text: str) -> str:
     """
-    Sends text content to LLM to extract financial data according to ExtractedFinancials schema.
-    Returns a tuple of (ExtractedFinancials, usage_dict).
+    Returns the text above the first amount row (company, title, period, scale).
+    """
+    match = _AMOUNT_RE.search(text)
+    return text[:match.start()] if match else text
+
+def _latest_period(header: str) -> Optional[str]:
+    dates = [(int(y), MONTHS_ID.index(m.lower()), int(d), f"{int(d)} {m.capitalize()} {y}")
+             for d, m, y in RE_PERIOD_ID.findall(header)]
+    return max(dates)[3] if dates else None
+
+def _close(a: float, b: float) -> bool:
+    return abs(a - b) <= REGEX_TOLERANCE * max(abs(a), abs(b), 1.0)
+
+def try_regex_extract(text: str, multiplier: float = None) -> Optional[ExtractedFinancials]:
     """
+    Extracts the top-line fields of a clean statement page with labeled-row regexes,
+    without calling the LLM. Returns None whenever the result is not trustworthy
+    (unknown company / period / currency / scale, a notes page, a header naming more
+    than one scale, missing companion rows, or totals that do not add up), so the
+    caller can fall back to the LLM.
+    """
+    head = text[:SCALE_CHARS]
+    if RE_NOTES_TITLE.search(head) and not RE_NOTES_FOOTER.search(head):
+        return None
+    header = _statement_header(text)
+    company = RE_COMPANY.search(header)
+    period = _latest_period(header)
+    if company is None or period is None:
+        return None
+    if RE_CURRENCY_USD.search(header):
+        currency = "USD"
+    elif RE_CURRENCY_IDR.search(header):
+        currency = "IDR"
+    else:
+        return None
+    
+    scales = _header_scales(text)
+    if len(scales) > 1:
+        return None
+    scale, detected_multiplier = scales[0] if scales else FULL_UNITS
+    if multiplier is None:
+        multiplier = detected_multiplier
+    # Full units is detect_scale's fallback; only trust it when the header says so
+    if multiplier == 1.0 and not RE_FULL_UNITS.search(header):
+        return None
+    
+    raw = {}
+    statements = {}
+    for section, patterns in RE_FIELD_ROWS.items():
+        metrics = {}
+        for field, pattern in patterns.items():
+            match = pattern.search(text)
+            if match:
+                raw[field] = _parse_amount(match.group('amount'))
+                metrics[field] = {"raw_text": match.group(0).strip(), "value": raw[field] * multiplier}
+        statements[section] = metrics
     
-    detected_scale_str, multiplier = detect_scale(text_content)
+    # Confidence checks: every total needs its companion rows, and the identities must hold
+    if 'total_assets' in raw and 'current_assets' not in raw:
+        return None
+    if 'total_liabilities' in raw and ('total_equity' not in raw or 'current_liabilities' not in raw):
+        return None
+    if 'total_equity' in raw and 'total_liabilities' not in raw:
+        return None
+    if 'total_assets' in raw and 'total_liabilities' in raw:
+        if not _close(raw['total_assets'], raw['total_liabilities'] + raw['total_equity']):
+            return None
+    check = RE_TOTAL_CHECK_ROW.search(text)
+    if check:
+        check_value = _parse_amount(check.group('amount'))
+        if 'total_assets' in raw and not _close(check_value, raw['total_assets']):
+            return None
+        if 'total_liabilities' in raw and not _close(check_value, raw['total_liabilities'] + raw['total_equity']):
+            return None
+    if 'revenues' in raw and 'net_income' not in raw:
+        return None
+    if 'gross_profit' in raw and ('revenues' not in raw or raw['gross_profit'] > raw['revenues']):
+        return None
+    if not any(field in raw for field in ('total_assets', 'total_liabilities', 'revenues')):
+        return None
     
-    system_prompt = f"""
+    return ExtractedFinancials(
+        company_name=_WHITESPACE_RE.sub(" ", company.group(0)),
+        report_period=period,
+        currency=currency,
+        scale=scale,
+        unit_multiplier=multiplier,
+        balance_sheet=BalanceSheet(**statements['balance_sheet']),
+        income_statement=IncomeStatement(**statements['income_statement']),
+    )
+
+LLM_MODEL = "grok-4-1-fast-reasoning"
+# Bump whenever extraction logic changes in a way the cache keys cannot see
+# (page filtering, regex fast path, merge): invalidates page and document cache entries
+PIPELINE_VERSION = "3"
+
+# Kept byte-identical across calls (no per-page content) so the provider can
+# reuse the cached prompt prefix. Per-page hints go into the user message.
+SYSTEM_PROMPT = f"""
     Anda adalah Akuntan Expert auditor PSAK. Tugas Anda adalah mengekstrak data keuangan dari teks kotor hasil OCR PDF.
     
     CRITICAL: IDENTIFIKASI UNIT/SKALA DENGAN BENAR.
     - Cari teks seperti "Dalam Jutaan Rupiah", "In Billions of IDR", "Thousands", dll.
-    - HINT DETEKSI AWAL: Kami mendeteksi skala mungkin adalah "{detected_scale_str}". Verifikasi ini dari teks!
+    - Pesan user berisi HINT DETEKSI AWAL skala untuk setiap halaman. Verifikasi hint ini dari teks!
     
     Rules:
     1. Identifikasi angka dengan hati-hati. 
@@ -158,37 +485,329 @@ def analyze_page_with_llm(text_content: str) -> tuple[ExtractedFinancials, dict]
        - 'net_income': Laba Bersih Tahun Berjalan 
        - 'finance_cost': Beban Keuangan / Bunga. Ambil secara matematis (jika di kurung, negatif).
     5. Jangan berhalusinasi. Jika field tidak ditemukan di teks, biarkan null.
+    
+    Contoh konversi:
+    - Skala "Dalam Jutaan Rupiah", baris "Jumlah aset 12.345.678" -> total_assets.value = 12345678000000, unit_multiplier = 1000000.
+    - Skala "In Billions of IDR", baris "Finance costs (1,234)" -> finance_cost.value = -1234000000000, unit_multiplier = 1000000000.
+    - Skala "Ribuan Rupiah", baris "Persediaan -" -> inventories.value = 0.
+    
+    Schema output (JSON Schema):
+    {json.dumps(ExtractedFinancials.model_json_schema(), ensure_ascii=False, sort_keys=True)}
+    """
+
+# Fixed opening of every user message: together with SYSTEM_PROMPT it forms the longest
+# byte-identical prefix across calls, so everything per page comes after it.
+SHARED_SCHEMA_HINT = (
+    "Extract financial data according to the JSON schema in the system prompt. "
+    "Each page starts with a scale hint and, when found, candidate metric lines; "
+    "verify both against the page text. Values are in full units (number x unit_multiplier), "
+    "numbers in parentheses are negative, and fields not on the page stay null."
+)
+
+def _strict_schema(node):
+    """
+    Rewrites a pydantic JSON schema for strict structured outputs: every object closes
+    additionalProperties and lists all its properties as required (Optional fields stay
+    nullable through their anyOf null branch), and defaults are dropped.
+    """
+    if isinstance(node, list):
+        return [_strict_schema(item) for item in node]
+    if not isinstance(node, dict):
+        return node
+    node = {key: _strict_schema(value) for key, value in node.items() if key != "default"}
+    if node.get("type") == "object" and "properties" in node:
+        node["additionalProperties"] = False
+        node["required"] = list(node["properties"])
+    return node
+
+def _response_format(model_cls) -> dict:
+    return {
+        "type": "json_schema",
+        "json_schema": {"name": model_cls.__name__, "strict": True, "schema": _strict_schema(model_cls.model_json_schema())},
+    }
+
+# Built once at import instead of being regenerated from the model on every request
+RESPONSE_FORMAT_PAGE = _response_format(ExtractedFinancials)
+RESPONSE_FORMAT_BATCH = _response_format(ExtractedFinancialsBatch)
+# The batch schema embeds the page schema, so it stands for both in cache keys
+RESPONSE_FORMAT_KEY = json.dumps(RESPONSE_FORMAT_BATCH, sort_keys=True)
+
+def _scale_hint(text_content: str) -> str:
+    detected_scale_str, _ = detect_scale(text_content)
+    return f'HINT DETEKSI AWAL: Kami mendeteksi skala mungkin adalah "{detected_scale_str}". Verifikasi ini dari teks!'
+
+def _candidate_rows(text_content: str) -> str:
+    """
+    Labeled rows the regex extractor recognizes, as "field | row" lines ahead of the page
+    text, so the LLM maps known rows instead of scanning for them. Only the matched part of
+    each row (label, note, current-period amount) is listed, to keep the prefix short.
     """
+    rows = []
+    for patterns in RE_FIELD_ROWS.values():
+        for field, pattern in patterns.items():
+            match = pattern.search(text_content)
+            if match:
+                rows.append(f"{field} | {_WHITESPACE_RE.sub(' ', match.group(0).strip())}")
+    if not rows:
+        return ""
+    return "Candidate metric lines (field | row, current period):\n" + "\n".join(rows) + "\n\nFull text:\n"
+
+def _usage_to_dict(usage) -> dict:
+    usage_metadata = {
+        "prompt_tokens": usage.prompt_tokens,
+        "completion_tokens": usage.completion_tokens,
+        "total_tokens": usage.total_tokens,
+    }
     
+    # Check for cached tokens if available in the specific SDK version/model response
+    if hasattr(usage, 'prompt_tokens_details') and usage.prompt_tokens_details:
+        usage_metadata["cached_tokens"] = getattr(usage.prompt_tokens_details, 'cached_tokens', 0)
+    else:
+        usage_metadata["cached_tokens"] = 0
+    return usage_metadata
+
+def _empty_usage() -> dict:
+    return {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0, "cached_tokens": 0}
+
+def _sum_usage(usages: List[dict]) -> dict:
+    total = _empty_usage()
+    for usage in usages:
+        for field in total:
+            total[field] += usage.get(field, 0)
+    return total
+
+def _page_prompt(text_content: str) -> str:
+    """Per-page part of the user message: scale hint, candidate rows, compacted page text."""
+    return f"{_scale_hint(text_content)}\n\n{_candidate_rows(text_content)}{_compact_for_llm(text_content)}"
+
+def _page_cache_key(page_prompt: str) -> str:
+    # Keyed on everything the model sees for the page (rendered prompt and output schema),
+    # so a change to the message construction never serves results from an older pipeline
+    return cache_key(PIPELINE_VERSION, LLM_MODEL, SYSTEM_PROMPT, SHARED_SCHEMA_HINT,
+                     RESPONSE_FORMAT_KEY, page_prompt)
+
+# In-process LRU layer over the disk cache: repeat lookups in one process skip the JSON read.
+# Bounded, since it lives as long as the Streamlit server process.
+MEMO_MAX_PAGES = 256
+_memo: "OrderedDict[str, ExtractedFinancials]" = OrderedDict()
+
+def _memo_put(key: str, result: ExtractedFinancials) -> None:
+    _memo[key] = result.model_copy(deep=True)
+    _memo.move_to_end(key)
+    if len(_memo) > MEMO_MAX_PAGES:
+        _memo.popitem(last=False)
+
+def _load_cached_page(key: str) -> Optional[ExtractedFinancials]:
+    # Copies out, since merge_financials mutates the first result it is given
+    if key in _memo:
+        _memo.move_to_end(key)
+        return _memo[key].model_copy(deep=True)
+    payload = cache_get(key)
+    if payload is None:
+        return None
     try:
-        completion = client.beta.chat.completions.parse(
-            model="grok-4-1-fast-reasoning",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": f"Extract financial data from this text:\n\n{text_content}"},
-            ],
-            response_format=ExtractedFinancials,
-        )
-        
-        usage = completion.usage
-        usage_metadata = {
-            "prompt_tokens": usage.prompt_tokens,
-            "completion_tokens": usage.completion_tokens,
-            "total_tokens": usage.total_tokens,
-        }
+        result = ExtractedFinancials.model_validate(payload["result"])
+    except Exception:
+        return None
+    _memo_put(key, result)
+    return result
+
+def _store_cached_page(key: str, result: ExtractedFinancials, usage: dict) -> None:
+    if result is not None:
+        _memo_put(key, result)
+        cache_put(key, {"result": result.model_dump(mode="json"), "usage": usage})
+
+# Calls currently running per event loop, so identical pages dispatched together (e.g. the
+# per-page retry of a batch that holds the same text twice) share one request
+_inflight = weakref.WeakKeyDictionary()
+
+def cached_llm_call(func):
+    """
+    Disk cache for single-page LLM calls, keyed on _page_cache_key (pipeline version, model,
+    prompts, output schema and the rendered page prompt).
+    A hit returns the stored result with zero usage, since no tokens were spent.
+    A page that is already being sent waits for that call instead of sending it again.
+    The page prompt is rendered once here and handed to func, which sends it as is.
+    """
+    async def call_and_store(key: str, page_prompt: str):
+        result, usage = await func(page_prompt)
+        _store_cached_page(key, result, usage)
+        return result, usage
+
+    @functools.wraps(func)
+    async def wrapper(text_content: str):
+        page_prompt = _page_prompt(text_content)
+        key = _page_cache_key(page_prompt)
+        cached = _load_cached_page(key)
+        if cached is not None:
+            return cached, _empty_usage()
         
-        # Check for cached tokens if available in the specific SDK version/model response
-        if hasattr(usage, 'prompt_tokens_details') and usage.prompt_tokens_details:
-            usage_metadata["cached_tokens"] = getattr(usage.prompt_tokens_details, 'cached_tokens', 0)
-        else:
-            usage_metadata["cached_tokens"] = 0
+        running = _inflight.setdefault(asyncio.get_running_loop(), {})
+        if key in running:
+            result, _usage = await asyncio.shield(running[key])
+            return (result.model_copy(deep=True) if result else result), _empty_usage()
+        running[key] = asyncio.ensure_future(call_and_store(key, page_prompt))
+        try:
+            return await asyncio.shield(running[key])
+        finally:
+            running.pop(key, None)
+    return wrapper
 
-        return completion.choices[0].message.parsed, usage_metadata
+@cached_llm_call
+@llm_retry
+async def analyze_page_with_llm(page_prompt: str) -> tuple[ExtractedFinancials, dict]:
+    """
+    Sends one page to LLM to extract financial data according to ExtractedFinancials schema.
+    Called with the page text; cached_llm_call renders it into page_prompt (_page_prompt).
+    This is the per-page path analyze_pages_with_llm falls back to when a batch response
+    cannot be matched to its pages.
+    Returns a tuple of (ExtractedFinancials, usage_dict).
+    """
+    
+    try:
+        async with _llm_semaphore():
+            completion = await get_client().chat.completions.create(
+                model=LLM_MODEL,
+                messages=[
+                    {"role": "system", "content": SYSTEM_PROMPT},
+                    {"role": "user", "content": f"{SHARED_SCHEMA_HINT}\n\n===PAGE===\n{page_prompt}"},
+                ],
+                response_format=RESPONSE_FORMAT_PAGE,
+            )
+        content = completion.choices[0].message.content
+        parsed = ExtractedFinancials.model_validate_json(content) if content else None
+        return parsed, _usage_to_dict(completion.usage)
         
     except Exception as e:
         print(f"Error in LLM extraction: {e}")
         raise e
 
+async def analyze_pages_with_llm(texts: List[str]) -> tuple[List[Optional[ExtractedFinancials]], dict]:
+    """
+    Sends several pages to the LLM in a single request, so the system prompt and
+    the round-trip are paid once per batch instead of once per page.
+    Pages already in the disk cache are served from there; only misses are sent, and
+    identical pages only once.
+    If the response does not hold exactly one item per page sent, the batch is discarded
+    (never cached) and those pages are sent one by one through analyze_page_with_llm.
+    Returns a tuple of (list of ExtractedFinancials aligned with texts, usage_dict).
+    """
+    # Each page is rendered once: the same prompt gives the cache key and the request block
+    prompts = [_page_prompt(text) for text in texts]
+    keys = [_page_cache_key(prompt) for prompt in prompts]
+    results = [_load_cached_page(key) for key in keys]
+    # Pages with the same key (identical text) are sent once and mapped back below
+    first_by_key = {}
+    for n, (key, result) in enumerate(zip(keys, results)):
+        if result is None:
+            first_by_key.setdefault(key, n)
+    if not first_by_key:
+        return results, _empty_usage()
+    missing = list(first_by_key)
+    
+    fresh, usage = await _analyze_batch_with_llm([prompts[first_by_key[key]] for key in missing])
+    if len(fresh) != len(missing):
+        # The items cannot be matched to their pages by position: ask page by page instead
+        print(f"LLM batch returned {len(fresh)} pages for {len(missing)}; retrying page by page")
+        singles = await asyncio.gather(*(analyze_page_with_llm(texts[first_by_key[key]]) for key in missing))
+        fresh = [result for result, _ in singles]
+        usage = _sum_usage([usage] + [page_usage for _, page_usage in singles])
+    else:
+        for key, result in zip(missing, fresh):
+            _store_cached_page(key, result, usage)
+    
+    fresh_by_key = dict(zip(missing, fresh))
+    handed_out = set()
+    for n, key in enumerate(keys):
+        if results[n] is None:
+            result = fresh_by_key[key]
+            # Every page gets its own object, since merge_pair fills the result it is given in place
+            if result is not None and key in handed_out:
+                result = result.model_copy(deep=True)
+            handed_out.add(key)
+            results[n] = result
+    return results, usage
+
+@llm_retry
+async def _analyze_batch_with_llm(page_prompts: List[str]) -> tuple[List[ExtractedFinancials], dict]:
+    blocks = []
+    for n, page_prompt in enumerate(page_prompts, start=1):
+        blocks.append(f"===PAGE {n}===\n{page_prompt}\n===END PAGE {n}===")
+    user_content = (
+        f"{SHARED_SCHEMA_HINT}\n\nExtract each page separately and return exactly one item in `pages` "
+        f"per page, in the same order. Pages in this request: {len(page_prompts)}\n\n" + "\n\n".join(blocks)
+    )
+    
+    try:
+        async with _llm_semaphore():
+            completion = await get_client().chat.completions.create(
+                model=LLM_MODEL,
+                messages=[
+                    {"role": "system", "content": SYSTEM_PROMPT},
+                    {"role": "user", "content": user_content},
+                ],
+                response_format=RESPONSE_FORMAT_BATCH,
+            )
+        content = completion.choices[0].message.content
+        batch = ExtractedFinancialsBatch.model_validate_json(content) if content else None
+        return (batch.pages if batch else []), _usage_to_dict(completion.usage)
+        
+    except Exception as e:
+        print(f"Error in LLM batch extraction: {e}")
+        raise e
+
+# Schema field names, read once at import instead of per merge
+BS_FIELDS = tuple(BalanceSheet.model_fields)
+IS_FIELDS = tuple(IncomeStatement.model_fields)
+
+def _compile_merge_fn(fields: tuple, name: str):
+    """
+    Generates a merge function specialized for the given fields: one direct
+    "fill if missing" statement per schema field, compiled once at import.
+    Works on the instances' __dict__ (plain dict ops, no pydantic __setattr__),
+    keeping __pydantic_fields_set__ in sync for filled fields.
+    The generated function returns True once every field of merged is populated.
+    """
+    lines = [
+        f"def {name}(merged, other):",
+        "    m = merged.__dict__",
+        "    o = other.__dict__",
+        "    complete = True",
+    ]
+    for field in fields:
+        lines.append(f"    if m[{field!r}] is None:")
+        lines.append(f"        if o[{field!r}] is not None:")
+        lines.append(f"            m[{field!r}] = o[{field!r}]")
+        lines.append(f"            merged.__pydantic_fields_set__.add({field!r})")
+        lines.append("        else:")
+        lines.append("            complete = False")
+    lines.append("    return complete")
+    namespace = {}
+    exec(compile("\n".join(lines), f"<merge {name}>", "exec"), namespace)
+    return namespace[name]
+
+_merge_bs = _compile_merge_fn(BS_FIELDS, "_merge_bs")
+_merge_is = _compile_merge_fn(IS_FIELDS, "_merge_is")
+
+def merge_pair(merged: ExtractedFinancials, other: ExtractedFinancials) -> bool:
+    """
+    Fills the missing values of merged (in place) from other.
+    Returns True once nothing is left to fill, i.e. later pages cannot change the result.
+    """
+    # Update Company / Period if missing
+    if (not merged.company_name or merged.company_name == "Unknown") and other.company_name:
+        merged.company_name = other.company_name
+    if (not merged.report_period or merged.report_period == "Unknown") and other.report_period:
+        merged.report_period = other.report_period
+        
+    # Update BS / IS field by field (see _compile_merge_fn)
+    bs_complete = _merge_bs(merged.balance_sheet, other.balance_sheet)
+    is_complete = _merge_is(merged.income_statement, other.income_statement)
+    
+    return (bs_complete and is_complete
+            and merged.company_name and merged.company_name != "Unknown"
+            and merged.report_period and merged.report_period != "Unknown")
+
 def merge_financials(extracted_list: List[ExtractedFinancials]) -> ExtractedFinancials:
     """
     Merges multiple ExtractedFinancials objects into one.
@@ -200,24 +819,8 @@ def merge_financials(extracted_list: List[ExtractedFinancials]) -> ExtractedFina
     merged = extracted_list[0]
     
     for other in extracted_list[1:]:
-        # Update Company / Period if missing
-        if (not merged.company_name or merged.company_name == "Unknown") and other.company_name:
-            merged.company_name = other.company_name
-        if (not merged.report_period or merged.report_period == "Unknown") and other.report_period:
-            merged.report_period = other.report_period
-            
-        # Update BS
-        for field in merged.balance_sheet.model_fields:
-            current_val = getattr(merged.balance_sheet, field)
-            new_val = getattr(other.balance_sheet, field)
-            if current_val is None and new_val is not None:
-                setattr(merged.balance_sheet, field, new_val)
-                
-        # Update IS
-        for field in merged.income_statement.model_fields:
-            current_val = getattr(merged.income_statement, field)
-            new_val = getattr(other.income_statement, field)
-            if current_val is None and new_val is not None:
-                setattr(merged.income_statement, field, new_val)
+        # Nothing left to fill: the remaining pages cannot change the result
+        if merge_pair(merged, other):
+            break
                 
     return merged
@@ -1,10 +1,12 @@
 import os
 import argparse
+import asyncio
+from pydantic_core import to_json
 import json
-from extractor import extract_text_from_pdf, filter_relevant_pages, analyze_page_with_llm, merge_financials
+from extractor import extract_text_from_pdf, filter_relevant_pages, analyze_pages_with_llm, merge_financials, is_page_financially_dense, dedupe_pages
 from schemas import ExtractedFinancials
 
-def main():
+async def main():
     parser = argparse.ArgumentParser(description="Extract financial data from PDF.")
     parser.add_argument("pdf_path", help="Path to the PDF file")
     args = parser.parse_args()
@@ -26,26 +28,40 @@ def main():
     print(f"Relevant Pages Map: {relevant_map}")
     
     # Collect indices
-    indices_to_process = set(relevant_map['balance_sheet'] + relevant_map['income_statement'])
+    indices_to_process = sorted(set(relevant_map['balance_sheet'] + relevant_map['income_statement']))
     
     if not indices_to_process:
         print("No relevant pages found by heuristics. Trying to process first 5 pages as fallback...")
-        indices_to_process = set(range(min(5, len(pages_text))))
+        indices_to_process = list(range(min(5, len(pages_text))))
+    
+    # Skip pages without enough numbers to hold a statement table (headers, narrative)
+    dense = [i for i in indices_to_process if is_page_financially_dense(pages_text[i])]
+    if len(dense) < len(indices_to_process):
+        print(f"Skipping {len(indices_to_process) - len(dense)} pages without numeric content")
+    indices_to_process = dense
+    
+    # Pages with identical text (repeated tables, duplicate extraction) are sent once
+    duplicates = dedupe_pages(pages_text, indices_to_process)
+    for first, copies in duplicates.items():
+        if len(copies) > 1:
+            print(f"Pages {[i+1 for i in copies]} have identical text; analyzing page {first+1} once")
+    indices_to_process = list(duplicates)
     
     extracted_results = []
     
-    # 3. Analyze with LLM
+    # 3. Analyze with LLM (all candidate pages in one request; cached pages are not re-sent)
     print(f"Analyzing {len(indices_to_process)} pages with LLM...")
-    for i in indices_to_process:
-        print(f" -> Analyzing Page {i+1}...")
-        text = pages_text[i]
-        try:
-            result = analyze_page_with_llm(text)
-            if result:
-                extracted_results.append(result)
-                # print(f"    Extracted: {result.company_name} - {result.report_period}")
-        except Exception as e:
-            print(f"    Failed to analyze page {i+1}: {e}")
+    try:
+        results, _usage = await analyze_pages_with_llm([pages_text[i] for i in indices_to_process])
+    except Exception as e:
+        print(f"    Failed to analyze pages: {e}")
+        results = [None] * len(indices_to_process)
+    for i, result in zip(indices_to_process, results, strict=True):
+        if result:
+            extracted_results.append(result)
+            # print(f"    Extracted: {result.company_name} - {result.report_period}")
+        else:
+            print(f"    No data extracted from page {i+1}")
             
     # 4. Merge Results
     print("Merging results...")
@@ -54,8 +70,9 @@ def main():
     if final_data:
         # Save to JSON
         output_file = "extracted_data.json"
-        with open(output_file, "w") as f:
-            f.write(final_data.model_dump_json(indent=2))
+        # Serialized straight to UTF-8 bytes by pydantic-core (no str round trip before the write)
+        with open(output_file, "wb") as f:
+            f.write(to_json(final_data, indent=2))
         print(f"Success! Data saved to {output_file}")
         
         # Print Summary
@@ -69,4 +86,4 @@ def main():
         print("Failed to extract any structured data.")
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())
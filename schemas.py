@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import List, Optional
 
 class FinancialMetric(BaseModel):
     raw_text: str = Field(..., description="Teks asli yang ditemukan di PDF (misal: 'Jumlah Aset Lancar')")
@@ -28,3 +28,6 @@ class ExtractedFinancials(BaseModel):
     unit_multiplier: float = Field(..., description="Multiplier angka (misal: Jutaan=1000000, Miliaran=1000000000, Satuan Penuh=1)")
     balance_sheet: BalanceSheet
     income_statement: IncomeStatement
+
+class ExtractedFinancialsBatch(BaseModel):
+    pages: List[ExtractedFinancials] = Field(..., description="Hasil ekstraksi per halaman, satu item untuk setiap halaman sesuai urutan input")
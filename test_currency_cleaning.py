@@ -0,0 +1,31 @@
+import pandas as pd
+from utils import clean_currency, clean_currency_series
+
+# Cells from statement tables plus the corners of float() syntax the vectorized version must mirror
+test_cells = [
+    "1.000.000", "83,361", "(100)", "(1.234)", "(921)", "12,5", "(12,5\n)", " 1.234 ", "\xa01.000\xa0",
+    "-", "–", "", "( - )", "0", "(0)", "+5", "--5", "abc", "Catatan 4", "1.2.3,4,5", "1 000",
+    "1e3", "1,5e-3", "1e", "e5", ",5", "5,",
+    "1_000", "1__0", "_1", "1_",
+    "١٢٣", "１２３",
+    "nan", "NaN", "(nan)", "inf", "-inf", "(inf)", "Infinity", "infinit",
+]
+
+def same(a, b):
+    # repr so that nan == nan and 0.0 != -0.0
+    return repr(a) == repr(b)
+
+def run_tests():
+    vectorized = clean_currency_series(pd.Series(test_cells)).tolist()
+    passed = 0
+    for cell, got in zip(test_cells, vectorized):
+        expected = clean_currency(cell)
+        if same(got, expected):
+            passed += 1
+        else:
+            print(f"FAIL: {cell!r}: clean_currency gives {expected!r}, clean_currency_series gives {got!r}")
+
+    print(f"\nSummary: {passed}/{len(test_cells)} cells match.")
+
+if __name__ == "__main__":
+    run_tests()
@@ -0,0 +1,118 @@
+from extractor import try_regex_extract
+
+BALANCE_SHEET_PAGE = """PT CONTOH SEJAHTERA Tbk
+LAPORAN POSISI KEUANGAN KONSOLIDASIAN
+31 MARET 2025 DAN 31 DESEMBER 2024
+(Dalam jutaan Rupiah, kecuali dinyatakan lain)
+Catatan atas laporan keuangan konsolidasian merupakan bagian yang tidak terpisahkan.
+Catatan 31 Maret 2025 31 Desember 2024
+Kas dan setara kas 4 1.250.000 1.100.000
+Persediaan 7 830.500 790.000
+Jumlah aset lancar 3.400.000 3.200.000
+Jumlah aset 10.000.000 9.600.000
+Jumlah liabilitas jangka pendek 2.100.000 2.000.000
+Jumlah liabilitas 4.000.000 3.900.000
+Jumlah ekuitas 6.000.000 5.700.000
+Jumlah liabilitas dan ekuitas 10.000.000 9.600.000
+"""
+
+INCOME_STATEMENT_PAGE = """PT CONTOH SEJAHTERA Tbk
+LAPORAN LABA RUGI KONSOLIDASIAN
+UNTUK PERIODE YANG BERAKHIR 31 MARET 2025 DAN 2024
+(Dalam jutaan Rupiah)
+Pendapatan bersih 27 5.000.000 4.500.000
+Beban pokok pendapatan (3.000.000) (2.800.000)
+Laba bruto 2.000.000 1.700.000
+Beban keuangan (150.000) (140.000)
+Laba periode berjalan 900.000 800.000
+"""
+
+# Summarised statement of an associate inside the notes: same row labels, not the filer's figures
+NOTES_PAGE = """PT CONTOH SEJAHTERA Tbk
+CATATAN ATAS
+LAPORAN KEUANGAN KONSOLIDASIAN
+31 MARET 2025
+(Dinyatakan dalam jutaan Rupiah)
+11. INVESTASI PADA ENTITAS ASOSIASI
+Ringkasan laporan laba rugi entitas asosiasi:
+Pendapatan bersih 26.278 24.620
+Laba periode berjalan 2.480 2.391
+"""
+
+MIXED_SCALE_PAGE = BALANCE_SHEET_PAGE.replace(
+    "(Dalam jutaan Rupiah, kecuali dinyatakan lain)",
+    "(Dalam jutaan Rupiah, kecuali informasi per saham dalam ribuan Rupiah)",
+)
+
+# Total assets without its current assets row, total liabilities without total equity
+MISSING_TOTALS_PAGE = "\n".join(
+    line for line in BALANCE_SHEET_PAGE.splitlines()
+    if not line.startswith(("Jumlah aset lancar", "Jumlah ekuitas"))
+)
+
+UNBALANCED_PAGE = BALANCE_SHEET_PAGE.replace("Jumlah ekuitas 6.000.000", "Jumlah ekuitas 5.000.000")
+
+def check_balance_sheet():
+    result = try_regex_extract(BALANCE_SHEET_PAGE)
+    if result is None:
+        return "no result for a clean balance sheet page"
+    bs = result.balance_sheet
+    expected = {
+        "company_name": (result.company_name, "PT CONTOH SEJAHTERA Tbk"),
+        "report_period": (result.report_period, "31 Maret 2025"),
+        "currency": (result.currency, "IDR"),
+        "unit_multiplier": (result.unit_multiplier, 1_000_000.0),
+        "total_assets": (bs.total_assets and bs.total_assets.value, 10_000_000 * 1_000_000.0),
+        "current_assets": (bs.current_assets and bs.current_assets.value, 3_400_000 * 1_000_000.0),
+        "total_liabilities": (bs.total_liabilities and bs.total_liabilities.value, 4_000_000 * 1_000_000.0),
+        "current_liabilities": (bs.current_liabilities and bs.current_liabilities.value, 2_100_000 * 1_000_000.0),
+        "total_equity": (bs.total_equity and bs.total_equity.value, 6_000_000 * 1_000_000.0),
+        "cash_equivalents": (bs.cash_equivalents and bs.cash_equivalents.value, 1_250_000 * 1_000_000.0),
+        "inventories": (bs.inventories and bs.inventories.value, 830_500 * 1_000_000.0),
+    }
+    wrong = [f"{name}={got!r} (expected {want!r})" for name, (got, want) in expected.items() if got != want]
+    return ", ".join(wrong) or None
+
+def check_income_statement():
+    result = try_regex_extract(INCOME_STATEMENT_PAGE)
+    if result is None:
+        return "no result for a clean income statement page"
+    is_stmt = result.income_statement
+    expected = {
+        "revenues": (is_stmt.revenues and is_stmt.revenues.value, 5_000_000 * 1_000_000.0),
+        "gross_profit": (is_stmt.gross_profit and is_stmt.gross_profit.value, 2_000_000 * 1_000_000.0),
+        "finance_cost": (is_stmt.finance_cost and is_stmt.finance_cost.value, -150_000 * 1_000_000.0),
+        "net_income": (is_stmt.net_income and is_stmt.net_income.value, 900_000 * 1_000_000.0),
+    }
+    wrong = [f"{name}={got!r} (expected {want!r})" for name, (got, want) in expected.items() if got != want]
+    return ", ".join(wrong) or None
+
+def check_rejected(text):
+    def check():
+        result = try_regex_extract(text)
+        return None if result is None else f"expected None, got {result.model_dump()}"
+    return check
+
+test_cases = [
+    ("clean balance sheet page", check_balance_sheet),
+    ("clean income statement page", check_income_statement),
+    ("notes page is rejected", check_rejected(NOTES_PAGE)),
+    ("mixed-scale page is rejected", check_rejected(MIXED_SCALE_PAGE)),
+    ("page with missing totals is rejected", check_rejected(MISSING_TOTALS_PAGE)),
+    ("page whose totals do not add up is rejected", check_rejected(UNBALANCED_PAGE)),
+]
+
+def run_tests():
+    passed = 0
+    for name, check in test_cases:
+        error = check()
+        if error is None:
+            print(f"PASS: {name}.")
+            passed += 1
+        else:
+            print(f"FAIL: {name}: {error}")
+
+    print(f"\nSummary: {passed}/{len(test_cases)} tests passed.")
+
+if __name__ == "__main__":
+    run_tests()
@@ -5,6 +5,7 @@ test_cases = [
     ("CONSOLIDATED STATEMENT OF FINANCIAL POSITION\n... (In Billions of Indonesian Rupiah) ...", ("Miliaran (Billions)", 1000000000.0)),
     ("LAPORAN LABA RUGI\n... (Dalam Ribuan Rupiah) ...", ("Ribuan (Thousands)", 1000.0)),
     ("STATEMENT OF PROFIT OR LOSS\n... (In Millions of Rupiah) ...", ("Jutaan (Millions)", 1000000.0)),
+    ("NERACA (Dalam Jutaan Rupiah) / BALANCE SHEET (In Billions of Rupiah)", ("Miliaran (Billions)", 1000000000.0)),
     ("Random text without scale info", ("Satuan Penuh (Full Units)", 1.0)),
 ]
 
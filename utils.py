@@ -1,5 +1,6 @@
 import re
 import pdfplumber
+import pypdfium2 as pdfium
 import pandas as pd
 import streamlit as st
 
@@ -37,73 +38,153 @@ def clean_currency(value_str):
     except ValueError:
         return 0.0
 
-def find_financial_pages(pdf):
+# Python float() syntax: Unicode decimal digits, single underscores between digits,
+# optional exponent, and nan / inf / infinity in any case
+_DIGITS = r'\p{Nd}(?:_?\p{Nd})*'
+NUMBER_PATTERN = (
+    rf'[+-]?(?:(?:{_DIGITS})?\.{_DIGITS}|{_DIGITS}\.?)(?:[eE][+-]?{_DIGITS})?'
+    r'|[+-]?(?i:nan|inf|infinity)'
+)
+
+def clean_currency_series(values):
+    """
+    Versi vectorized dari clean_currency untuk satu kolom string (pd.Series) sekaligus.
+    Hasilnya sama dengan clean_currency untuk setiap sel string, termasuk digit non-ASCII,
+    underscore ('1_000') dan 'nan'/'inf'; sel yang tidak bisa di-parse jadi 0.0.
+    """
+    s = values.astype("string[pyarrow]").str.strip()
+    is_negative = (s.str.startswith('(') & s.str.endswith(')')).fillna(False).astype(bool)
+    s = s.str.slice(1, -1).where(is_negative, s)
+    s = s.str.replace('.', '', regex=False).str.replace(',', '.', regex=False).str.strip()
+    # Cast hanya string yang diterima float() (NUMBER_PATTERN); sisanya 0.0, sama seperti float() gagal
+    valid = s.str.fullmatch(NUMBER_PATTERN).fillna(False).astype(bool)
+    vals = s.where(valid).astype(float)
+    vals = vals.where(~is_negative, -vals)
+    return vals.where(valid, 0.0)
+
+PAGE_KEYWORDS = {
+    # Keywords for Start
+    'neraca_start': ["laporan posisi keuangan", "statement of financial position"],
+    'labarugi_start': ["laporan laba rugi", "statement of profit or loss"],
+    # Keywords for End (Termination)
+    'neraca_end': ["jumlah liabilitas dan ekuitas", "total liabilities and equity"],
+    'labarugi_end': ["laba (rugi) per saham", "earnings (loss) per share", "laba per saham"],
+    'toc': ["daftar isi", "table of contents"],
+    'equity': ["ekuitas", "equity"],
+}
+
+# Keyword classes checked against the whole page, and against the header window only
+PAGE_TAGS = ('toc', 'neraca_end', 'labarugi_end', 'labarugi_start')
+HEADER_TAGS = ('neraca_start', 'labarugi_start', 'equity')
+
+def _tags(tags, text):
+    # Tags with a keyword in text (already lowercased)
+    return {tag for tag in tags if any(text.find(kw) != -1 for kw in PAGE_KEYWORDS[tag])}
+
+# Lines treated as the page header. pdfium emits the footer block first on some filings
+# (BUMI), which pushes the statement title down to line 11-12.
+HEADER_LINES = 12
+
+def _header_end(text):
+    """Offset where the first HEADER_LINES lines of text end."""
+    end = -1
+    for _ in range(HEADER_LINES):
+        end = text.find("\n", end + 1)
+        if end == -1:
+            return len(text)
+    return end
+
+def iter_page_texts(pdf_source):
+    """
+    Yields the plain text of every page using pdfium (C engine; far faster than
+    pdfplumber's character-level layout pass, which is only needed for tables).
+    pdf_source: file path, PDF bytes or binary file-like object.
+    """
+    pdf = pdfium.PdfDocument(pdf_source)
+    try:
+        for i in range(len(pdf)):
+            page = pdf[i]
+            textpage = page.get_textpage()
+            text = textpage.get_text_range()
+            textpage.close()
+            page.close()
+            yield text.replace("\r\n", "\n") if text else ""
+    finally:
+        pdf.close()
+
+def find_financial_pages(pdf_source):
     """
     Mencari rentang halaman Neraca dan Laba Rugi.
+    pdf_source: file path, PDF bytes or binary file-like object (text is read with pdfium).
+    Pages are streamed one at a time and the scan stops once both statements have ended, so
+    statements repeated later in the filing (e.g. parent-entity supplementary statements) are not returned.
     Returns dictionary: {'neraca': [indices], 'labarugi': [indices]}
     """
     pages = {'neraca': [], 'labarugi': []}
     
     found_neraca_start = False
     found_labarugi_start = False
-    
-    # Keywords for Start
-    kw_neraca_start = ["laporan posisi keuangan", "statement of financial position"]
-    kw_labarugi_start = ["laporan laba rugi", "statement of profit or loss"]
-    
-    # Keywords for End (Termination)
-    kw_neraca_end = ["jumlah liabilitas dan ekuitas", "total liabilities and equity"]
-    kw_labarugi_end = ["laba (rugi) per saham", "earnings (loss) per share", "laba per saham"]
 
-    for i, page in enumerate(pdf.pages):
-        text = page.extract_text()
+    for i, text in enumerate(iter_page_texts(pdf_source)):
         if not text:
             continue
             
         text_lower = text.lower()
+        page_tags = _tags(PAGE_TAGS, text_lower)
         
         # Abaikan halaman Daftar Isi
-        if "daftar isi" in text_lower or "table of contents" in text_lower:
+        if 'toc' in page_tags:
             continue
+        
+        # Usually the title is in the top part (first HEADER_LINES lines); joined into
+        # one line so a title that is split across lines still matches
+        header_area = text_lower[:_header_end(text_lower)].replace("\n", " ")
+        header_tags = _tags(HEADER_TAGS, header_area)
             
         # 1. Detection for NERACA
         if not found_neraca_start:
             # Check if this page starts the Balance Sheet
-            # Usually the title is in the top part
-            header_area = " ".join(text_lower.split('\n')[:10])
-            if any(kw in header_area for kw in kw_neraca_start):
+            if 'neraca_start' in header_tags:
                 found_neraca_start = True
                 pages['neraca'].append(i)
-        elif found_neraca_start and not any(kw in text_lower for kw in kw_neraca_end):
+        elif 'neraca_end' not in page_tags:
             # If we are in Neraca section and haven't hit the end, add page
             # But check if it's the next section already
-            if any(kw in text_lower for kw in kw_labarugi_start):
+            if 'labarugi_start' in page_tags:
                  found_neraca_start = True # Keep it true but stop adding here? No, sections are usually sequential.
                  pass
             else:
                  pages['neraca'].append(i)
-        elif found_neraca_start and any(kw in text_lower for kw in kw_neraca_end):
+        else:
             pages['neraca'].append(i)
             found_neraca_start = False # Finished collecting Neraca
             
         # 2. Detection for LABA RUGI
         if not found_labarugi_start:
-            header_area = " ".join(text_lower.split('\n')[:10])
-            if any(kw in header_area for kw in kw_labarugi_start):
+            if 'labarugi_start' in header_tags:
                 # Avoid "Changes in Equity"
-                if "ekuitas" not in header_area and "equity" not in header_area:
+                if 'equity' not in header_tags:
                     found_labarugi_start = True
                     pages['labarugi'].append(i)
-        elif found_labarugi_start and not any(kw in text_lower for kw in kw_labarugi_end):
+        elif 'labarugi_end' not in page_tags:
             pages['labarugi'].append(i)
-        elif found_labarugi_start and any(kw in text_lower for kw in kw_labarugi_end):
+        else:
             pages['labarugi'].append(i)
             found_labarugi_start = False # Finished
+        
+        # Both statements collected and closed: the rest of the filing (notes) is never read
+        if pages['neraca'] and pages['labarugi'] and not (found_neraca_start or found_labarugi_start):
+            break
             
     # Cleaning: if we never found an end, but collected many pages, it might be a false positive.
     # Standard usually 1-3 pages.
     return pages
 
+# Cell checks in extract_table_from_page, compiled once
+ZERO_CELLS = frozenset(['-', '–', '( - )', '0'])
+RE_VALUE_CELL = re.compile(r'[\d\(\)]')
+RE_FALLBACK_CELL = re.compile(r'[\d\-–]')
+
 def extract_table_from_page(page):
     """
     Ekstrak tabel dari halaman PDF, bersihkan baris kosong/header invalid.
@@ -122,13 +203,16 @@ def extract_table_from_page(page):
     table = None
     for setting in settings:
         table = page.extract_table(table_settings=setting)
-        if table and len(table) > 0 and len(table[0]) >= 2:
+        # Stop at the first strategy that gives a usable (2+ column) table
+        if table and len(table[0]) >= 2:
             break
             
     if not table:
         return pd.DataFrame(columns=['Label', 'Value_Raw', 'Value_Clean'])
     
-    data = []
+    # Column lists, handed to pandas once at the end (no per-row list objects)
+    labels = []
+    raws = []
     
     for row in table:
         if not row or len(row) < 2:
@@ -142,9 +226,11 @@ def extract_table_from_page(page):
         # Potentially matching a financial row.
         # We look for the "Current Year" value.
         # Heuristic: Scan columns from index 1 to end.
+        # One pass from left to right (after label): the first "good" value wins,
+        # and the last numeric-looking column is kept as the fallback on the way
         found_val = None
+        last_numeric = None
         
-        # Check from left to right (after label)
         for col in row[1:]:
             if col is None: continue
             s_col = str(col).strip()
@@ -154,13 +240,13 @@ def extract_table_from_page(page):
             # 2. Or is a dash/strip '-'
             # 3. Usually not just a few letters unless it's a small number
             
-            if s_col == '-' or s_col == '–' or s_col == '( - )' or s_col == '0':
+            if s_col in ZERO_CELLS:
                 found_val = '0'
                 break
                 
             # Regex to find numbers, potentially with (.) thousand separator or (,) decimal
             # and potentially in parentheses (negative)
-            if re.search(r'[\d\(\)]', s_col):
+            if RE_VALUE_CELL.search(s_col):
                 # We need to distinguish between "Note number" and "Financial Value".
                 # Note numbers are usually small (1-digit or 2-digits).
                 # Values are usually large (thousand+) or have separators.
@@ -174,93 +260,112 @@ def extract_table_from_page(page):
                 if not is_likely_note:
                     found_val = s_col
                     break
+            
+            # Fallback candidate: any column with a digit or dash (the last one wins)
+            if col and RE_FALLBACK_CELL.search(str(col)):
+                last_numeric = str(col)
         
         # Fallback: if we didn't find a "good" value, but there's at least one numeric column, take it
         if not found_val:
-            for col in reversed(row[1:]):
-                if col and re.search(r'[\d\-–]', str(col)):
-                    found_val = str(col)
-                    break
+            found_val = last_numeric
 
         if found_val:
-             data.append([label_candidate, found_val])
+             labels.append(label_candidate)
+             raws.append(found_val)
              
-    if not data:
+    if not labels:
         return pd.DataFrame(columns=['Label', 'Value_Raw', 'Value_Clean'])
         
-    df = pd.DataFrame(data, columns=['Label', 'Value_Raw'])
-    df['Value_Clean'] = df['Value_Raw'].apply(clean_currency)
+    df = pd.DataFrame({'Label': labels, 'Value_Raw': raws})
+    df['Value_Clean'] = clean_currency_series(df['Value_Raw'])
     
     return df
 
+# Define regex patterns for each key
+# List of keywords for each item. Logic: First match wins (patterns are tried in order).
+MAPPING_PATTERNS = {
+    'total_assets': [r'^jumlah aset$', r'^total assets$', r'jumlah aset \/ total assets'],
+    'current_assets': [r'jumlah aset lancar', r'total current assets'],
+    'cash_equivalents': [r'kas dan setara kas', r'cash and cash equivalents'],
+    'inventories': [r'persediaan', r'inventories'],
+    'total_liabilities': [r'^jumlah liabilitas$', r'^total liabilities$'],
+    'current_liabilities': [r'jumlah liabilitas jangka pendek', r'total current liabilities'],
+    'total_equity': [r'^jumlah ekuitas$', r'^total equity$'],
+    
+    'revenues': [r'pendapatan usaha', r'pendapatan bersih', r'revenues', r'sales', r'pendapatan pokok'],
+    'gross_profit': [r'laba bruto', r'gross profit'],
+    'net_income': [
+        r'laba .* atribusi .* pemilik entitas induk', 
+        r'profit .* attributable to owners of the parent',
+        r'laba tahun berjalan', 
+        r'profit for the year'
+    ],
+    'finance_cost': [r'beban keuangan', r'finance costs']
+}
+# Anchored literal patterns like r'^jumlah aset$' need no regex at all: they become
+# the plain (lowercase) label string and are answered by a dict lookup
+RE_EXACT_PATTERN = re.compile(r'\^([a-z ]+)\$')
+
+def _compile_mapping_pattern(pattern):
+    exact = RE_EXACT_PATTERN.fullmatch(pattern)
+    return exact.group(1) if exact else re.compile(pattern, re.IGNORECASE)
+
+# Compiled once at import (case insensitive), instead of on every str.contains call
+COMPILED_PATTERNS = {
+    key: [_compile_mapping_pattern(pattern) for pattern in patterns]
+    for key, patterns in MAPPING_PATTERNS.items()
+}
+NERACA_KEYS = ('total_assets', 'current_assets', 'cash_equivalents', 'inventories',
+               'total_liabilities', 'current_liabilities', 'total_equity')
+LABARUGI_KEYS = ('revenues', 'gross_profit', 'net_income', 'finance_cost')
+
 def map_financial_data(df_neraca, df_labarugi):
     """
     Mapping extracted rows ke variabel standar menggunakan Regex.
     """
     
-    mapping_results = {
-        # Neraca
-        'total_assets': 0.0,
-        'current_assets': 0.0,
-        'cash_equivalents': 0.0,
-        'inventories': 0.0,
-        'total_liabilities': 0.0,
-        'current_liabilities': 0.0,
-        'total_equity': 0.0,
-        # Laba Rugi
-        'revenues': 0.0,
-        'gross_profit': 0.0,
-        'net_income': 0.0,
-        'finance_cost': 0.0
-    }
-    
-    # Define regex patterns for each key
-    # List of keywords for each item. Logic: First match wins.
-    patterns = {
-        'total_assets': [r'^jumlah aset$', r'^total assets$', r'jumlah aset \/ total assets'],
-        'current_assets': [r'jumlah aset lancar', r'total current assets'],
-        'cash_equivalents': [r'kas dan setara kas', r'cash and cash equivalents'],
-        'inventories': [r'persediaan', r'inventories'],
-        'total_liabilities': [r'^jumlah liabilitas$', r'^total liabilities$'],
-        'current_liabilities': [r'jumlah liabilitas jangka pendek', r'total current liabilities'],
-        'total_equity': [r'^jumlah ekuitas$', r'^total equity$'],
-        
-        'revenues': [r'pendapatan usaha', r'pendapatan bersih', r'revenues', r'sales', r'pendapatan pokok'],
-        'gross_profit': [r'laba bruto', r'gross profit'],
-        'net_income': [
-            r'laba .* atribusi .* pemilik entitas induk', 
-            r'profit .* attributable to owners of the parent',
-            r'laba tahun berjalan', 
-            r'profit for the year'
-        ],
-        'finance_cost': [r'beban keuangan', r'finance costs']
-    }
+    mapping_results = dict.fromkeys(NERACA_KEYS + LABARUGI_KEYS, 0.0)
     
-    def search_df(df, patterns_list):
+    def label_rows(df):
+        # Plain lists, pulled out once per table (the tables are small; iterating
+        # Python strings beats building a pandas mask per pattern)
         if df.empty or 'Label' not in df.columns:
-            return 0.0
-        for pattern in patterns_list:
-            # Case insensitive search
+            return [], [], {}
+        labels = df['Label'].tolist()
+        values = df['Value_Clean'].tolist()
+        # Lowercased label -> value of its first row, for the exact (anchored) patterns
+        exact = {}
+        for label, value in zip(labels, values):
+            if isinstance(label, str):
+                exact.setdefault(label.lower(), value)
+        return labels, values, exact
+    
+    def search_df(rows, compiled_patterns):
+        labels, values, exact = rows
+        for pattern in compiled_patterns:
+            if isinstance(pattern, str):
+                if pattern in exact:
+                    return exact[pattern]
+                continue
             # We look for rows where 'Label' matches pattern
-            matches = df[df['Label'].str.contains(pattern, case=False, na=False, regex=True)]
-            if not matches.empty:
-                # Return the Clean Value of the first match
-                # Sometimes there are multiple (e.g. Header and Total), usually Total is the one with Number (Headers might be empty or 0 if parsed wrong)
-                # But our extractor filters rows with numbers.
-                # Optimization: "Jumlah" usually implies the total.
-                return matches.iloc[0]['Value_Clean']
+            for label, value in zip(labels, values):
+                if isinstance(label, str) and pattern.search(label):
+                    # Return the Clean Value of the first match
+                    # Sometimes there are multiple (e.g. Header and Total), usually Total is the one with Number (Headers might be empty or 0 if parsed wrong)
+                    # But our extractor filters rows with numbers.
+                    # Optimization: "Jumlah" usually implies the total.
+                    return value
         return 0.0
 
     # Map Neraca Items
-    for key in ['total_assets', 'current_assets', 'cash_equivalents', 'inventories', 
-                'total_liabilities', 'current_liabilities', 'total_equity']:
-        val = search_df(df_neraca, patterns[key])
-        mapping_results[key] = val
+    neraca_rows = label_rows(df_neraca)
+    for key in NERACA_KEYS:
+        mapping_results[key] = search_df(neraca_rows, COMPILED_PATTERNS[key])
         
     # Map Laba Rugi Items
-    for key in ['revenues', 'gross_profit', 'net_income', 'finance_cost']:
-        val = search_df(df_labarugi, patterns[key])
-        mapping_results[key] = val
+    labarugi_rows = label_rows(df_labarugi)
+    for key in LABARUGI_KEYS:
+        mapping_results[key] = search_df(labarugi_rows, COMPILED_PATTERNS[key])
         
     return mapping_results
 
@@ -276,50 +381,40 @@ def calculate_ratios_structured(data: ExtractedFinancials):
     """
     Menghitung rasio finansial berdasarkan objek ExtractedFinancials.
     """
-    ratios = {}
-    
-    # Extract values for easier access
+    # Extract values once into locals (None = not found in the report)
     bs = data.balance_sheet
     is_stmt = data.income_statement
     
-    # Helper for safe division
-    def div(n, d):
-        if n is None or d is None or d.value == 0:
-            return 0.0
-        return (n.value / d.value * 100)
-    
-    def div_raw(n, d):
-        if n is None or d is None or d.value == 0:
-            return 0.0
-        return (n.value / d.value)
-
-    # Profitability
-    ratios['GPM'] = div(is_stmt.gross_profit, is_stmt.revenues)
-    ratios['NPM'] = div(is_stmt.net_income, is_stmt.revenues)
-    ratios['ROE'] = div(is_stmt.net_income, bs.total_equity)
-    ratios['ROA'] = div(is_stmt.net_income, bs.total_assets)
-    
-    # Solvency
-    ratios['DER'] = div_raw(bs.total_liabilities, bs.total_equity)
+    ta = bs.total_assets.value if bs.total_assets else None
+    tl = bs.total_liabilities.value if bs.total_liabilities else None
+    te = bs.total_equity.value if bs.total_equity else None
+    ca = bs.current_assets.value if bs.current_assets else None
+    cl = bs.current_liabilities.value if bs.current_liabilities else None
+    cash = bs.cash_equivalents.value if bs.cash_equivalents else None
+    inv = bs.inventories.value if bs.inventories else 0.0
+    rev = is_stmt.revenues.value if is_stmt.revenues else None
+    gp = is_stmt.gross_profit.value if is_stmt.gross_profit else None
+    ni = is_stmt.net_income.value if is_stmt.net_income else None
+    fc = is_stmt.finance_cost.value if is_stmt.finance_cost else None
     
-    # Interest Coverage
-    if is_stmt.net_income and is_stmt.finance_cost and is_stmt.finance_cost.value != 0:
+    # Safe division: 0.0 when either side is missing or the denominator is zero
+    ratios = {
+        # Profitability
+        'GPM': gp / rev * 100 if gp is not None and rev else 0.0,
+        'NPM': ni / rev * 100 if ni is not None and rev else 0.0,
+        'ROE': ni / te * 100 if ni is not None and te else 0.0,
+        'ROA': ni / ta * 100 if ni is not None and ta else 0.0,
+        # Solvency
+        'DER': tl / te if tl is not None and te else 0.0,
+        # Interest Coverage
         # Note: finance_cost is usually negative in IS, we need to handle signs
         # EBIT Proxy = Net Income + |Finance Cost|
-        ebit_proxy = is_stmt.net_income.value + abs(is_stmt.finance_cost.value)
-        ratios['Interest Coverage'] = ebit_proxy / abs(is_stmt.finance_cost.value)
-    else:
-        ratios['Interest Coverage'] = 0.0
-    
-    # Liquidity
-    ratios['Current Ratio'] = div_raw(bs.current_assets, bs.current_liabilities)
-    ratios['Cash Ratio'] = div_raw(bs.cash_equivalents, bs.current_liabilities)
-    
-    # Quick Ratio: (Current Assets - Inventories) / Current Liabilities
-    if bs.current_assets and bs.current_liabilities:
-        inv_val = bs.inventories.value if bs.inventories else 0.0
-        ratios['Quick Ratio'] = (bs.current_assets.value - inv_val) / bs.current_liabilities.value
-    else:
-        ratios['Quick Ratio'] = 0.0
+        'Interest Coverage': (ni + abs(fc)) / abs(fc) if ni is not None and fc else 0.0,
+        # Liquidity
+        'Current Ratio': ca / cl if ca is not None and cl else 0.0,
+        'Cash Ratio': cash / cl if cash is not None and cl else 0.0,
+        # Quick Ratio: (Current Assets - Inventories) / Current Liabilities
+        'Quick Ratio': (ca - inv) / cl if ca is not None and cl is not None else 0.0,
+    }
     
     return ratios